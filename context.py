@@ -0,0 +1,147 @@
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+# 中日韩字符大约一个字一个token，其它字符大约四个字符一个token
+CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+KNOWLEDGE_HEADER = "\n\n相关背景：\n"
+
+
+def estimate_tokens(text):
+    """粗略估算文本的token数量"""
+    if not text:
+        return 0
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def trim_to_tokens(text, budget):
+    """把文本截断到不超过指定的token数量"""
+    if budget <= 0:
+        return ""
+    if estimate_tokens(text) <= budget:
+        return text
+    # 二分查找能放下的最长前缀
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) + 1 <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + "…"
+
+
+class ConversationMemory:
+    """按 (群聊, 发送人) 保存最近几轮对话，空闲最久的会话优先淘汰"""
+
+    def __init__(self, max_turns=4, max_sessions=500, idle_seconds=3600, max_turn_tokens=400):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_turn_tokens = max_turn_tokens
+        self.sessions = OrderedDict()  # key -> (最后活跃时间, deque[(问题, 回答)])
+        self.lock = threading.Lock()
+
+    def _expire(self, now):
+        """淘汰空闲超时的会话（OrderedDict 头部是最久未使用的）"""
+        while self.sessions:
+            key, (last_used, _) = next(iter(self.sessions.items()))
+            if now - last_used <= self.idle_seconds:
+                break
+            self.sessions.popitem(last=False)
+
+    def record(self, key, question, answer):
+        """记录一轮对话"""
+        now = time.time()
+        turn = (trim_to_tokens(question, self.max_turn_tokens),
+                trim_to_tokens(answer, self.max_turn_tokens))
+        with self.lock:
+            self._expire(now)
+            entry = self.sessions.pop(key, None)
+            turns = entry[1] if entry else deque(maxlen=self.max_turns)
+            turns.append(turn)
+            self.sessions[key] = (now, turns)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+
+    def recent(self, key, token_budget):
+        """取出不超过预算的最近几轮对话，按时间顺序返回消息列表"""
+        now = time.time()
+        with self.lock:
+            self._expire(now)
+            entry = self.sessions.get(key)
+            if entry is None:
+                return []
+            self.sessions.move_to_end(key)
+            self.sessions[key] = (now, entry[1])
+            turns = list(entry[1])
+
+        messages = []
+        used = 0
+        for question, answer in reversed(turns):
+            cost = estimate_tokens(question) + estimate_tokens(answer)
+            if used + cost > token_budget:
+                break
+            messages[:0] = [
+                {"role": "user", "content": question},
+                {"role": "assistant", "content": answer},
+            ]
+            used += cost
+        return messages
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+class ContextBuilder:
+    """在token预算内组装系统提示、知识片段、历史对话和当前问题"""
+
+    def __init__(self, token_budget=2000, knowledge_share=0.6, max_question_tokens=500,
+                 min_snippet_tokens=32, memory=None):
+        self.token_budget = token_budget
+        self.knowledge_share = knowledge_share  # 知识片段最多占用剩余预算的比例，其余留给历史对话
+        self.max_question_tokens = max_question_tokens
+        self.min_snippet_tokens = min_snippet_tokens
+        self.memory = memory if memory is not None else ConversationMemory()
+
+    def select_knowledge(self, knowledge, token_budget):
+        """按匹配分数挑选知识片段，放不下的截断或丢弃"""
+        selected = []
+        remaining = token_budget
+        for item in sorted(knowledge, key=lambda x: x.get('score', 0), reverse=True):
+            cost = estimate_tokens(item['content']) + 1
+            if cost <= remaining:
+                selected.append(item)
+                remaining -= cost
+            elif remaining >= self.min_snippet_tokens:
+                selected.append(dict(item, content=trim_to_tokens(item['content'], remaining - 1)))
+                remaining = 0
+            if remaining < self.min_snippet_tokens:
+                break
+        return selected
+
+    def build(self, system_prompt, question, key=None, knowledge=None, fallback_hint=""):
+        """返回 (messages, 实际使用的知识条目)"""
+        question = trim_to_tokens(question, self.max_question_tokens)
+        remaining = self.token_budget - estimate_tokens(system_prompt) - estimate_tokens(question)
+
+        snippets = self.select_knowledge(knowledge or [], int(max(remaining, 0) * self.knowledge_share))
+        if snippets:
+            background = KNOWLEDGE_HEADER + "\n".join(f"- {item['content']}" for item in snippets)
+        else:
+            background = fallback_hint
+        system_prompt += background
+        remaining -= estimate_tokens(background)
+
+        history = self.memory.recent(key, remaining) if key is not None else []
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(history)
+        messages.append({"role": "user", "content": question})
+        return messages, snippets
+
+    def record(self, key, question, answer):
+        if key is not None:
+            self.memory.record(key, question, answer)
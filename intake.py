@@ -0,0 +1,165 @@
+import logging
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class IntakeEngine:
+    """消息接入：注册/注销wxauto监听，收到的消息先进入队列，由分发线程交给处理函数
+
+    两种接入方式：
+    - callback：wxauto 4 的 AddListenChat(nickname, callback)，由wxauto内部线程拉取消息，回调只入队；
+    - poll：wxauto 3.9 的 AddListenChat(who) + GetListenMessage()，由本引擎轮询拉取，
+      有新消息时用最短间隔，空闲时逐步退避到最长间隔。
+    """
+
+    def __init__(self, wx, handler, mode="callback", min_interval=0.2, max_interval=5.0, backoff=2.0,
+                 max_queue=10000, metrics=None, on_stopped=None):
+        if mode not in ("callback", "poll"):
+            raise ValueError(f"不支持的接入方式: {mode}")
+        self.wx = wx
+        self.handler = handler
+        self.mode = mode
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.metrics = metrics
+        self.on_stopped = on_stopped  # 队列处理完、分发线程退出前调用
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.chat_name = None
+        self.interval = min_interval
+        self._stop_event = threading.Event()
+        # 入队和停止共用一把锁，保证停止后不会有消息排在 _STOP 后面
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stop_queued = False
+        self._poll_thread = None
+
+    def start(self, chat_name):
+        """注册群聊监听并启动分发线程（轮询方式还会启动轮询线程）"""
+        self.chat_name = chat_name
+        self.interval = self.min_interval
+        self._stop_event.clear()
+        self._closed = False
+        self._stop_queued = False
+        if self.mode == "poll":
+            self.wx.AddListenChat(who=chat_name)
+            self._poll_thread = threading.Thread(target=self._poll_loop, args=(chat_name,), daemon=True)
+            self._poll_thread.start()
+        else:
+            self.wx.AddListenChat(nickname=chat_name, callback=self._enqueue)
+        threading.Thread(target=self._dispatch_loop, daemon=True).start()
+
+    def stop(self):
+        """停止接入并立即返回，已入队的消息由分发线程处理完后再退出
+
+        轮询方式由轮询线程拉取最后一批消息后再注销监听，wxauto缓冲区里已收到的消息不会丢失。
+        """
+        if self.chat_name is None:
+            return
+        chat_name, self.chat_name = self.chat_name, None
+        self._stop_event.set()
+        if self.mode != "poll":
+            self._close(chat_name)
+
+    def _close(self, chat_name):
+        """不再接收新消息，在队尾放入 _STOP 并注销监听"""
+        with self._lock:
+            self._closed = True
+            self._stop_queued = True
+            self.queue.put(_STOP)
+        remove = getattr(self.wx, 'RemoveListenChat', None)
+        if remove:
+            try:
+                remove(chat_name)
+            except Exception as e:
+                logging.error(f"移除群聊监听失败: {str(e)}")
+        else:
+            logging.warning("当前wxauto版本不支持RemoveListenChat，之后的回调会被丢弃")
+
+    def join(self, timeout=None):
+        """等待已收到的消息都已交给处理函数，返回是否全部完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self._stop_event.is_set() and self._poll_thread is not None:
+            # 停止后先等轮询线程拉完最后一批消息
+            self._poll_thread.join(timeout)
+            if self._poll_thread.is_alive():
+                return False
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def pending(self):
+        """还没交给处理函数的消息数"""
+        return max(0, self.queue.unfinished_tasks - self._stop_queued)
+
+    def _enqueue(self, msg, chat):
+        """wxauto回调：只入队，不做任何处理"""
+        with self._lock:
+            if self._closed:
+                if self.metrics:
+                    self.metrics.inc('messages_dropped_total')
+                return False
+            try:
+                self.queue.put_nowait((time.perf_counter(), msg, chat))
+                return True
+            except queue.Full:
+                pass
+        logging.warning("消息队列已满，丢弃消息")
+        if self.metrics:
+            self.metrics.inc('intake_dropped_total')
+        return False
+
+    def _dispatch_loop(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _STOP:
+                    self._stop_queued = False
+                    if self.on_stopped:
+                        self.on_stopped()
+                    return
+                received_at, msg, chat = item
+                if self.metrics:
+                    self.metrics.observe('stage_latency_seconds', time.perf_counter() - received_at,
+                                         stage='intake_wait')
+                self.handler(msg, chat)
+            except Exception as e:
+                logging.error(f"分发消息时出错: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    def _poll_loop(self, chat_name):
+        """按活跃程度调整间隔轮询新消息，停止时再拉取一次后注销监听"""
+        while not self._stop_event.wait(self.interval):
+            received = self._poll_once()
+            if received is None:
+                self.interval = self.max_interval
+            elif received:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+        self._poll_once()
+        self._close(chat_name)
+
+    def _poll_once(self):
+        """拉取一次新消息并入队，返回入队的条数，拉取失败时返回 None"""
+        try:
+            with_messages = self.wx.GetListenMessage() or {}
+        except Exception as e:
+            logging.error(f"拉取监听消息失败: {str(e)}")
+            return None
+
+        received = 0
+        for chat, messages in with_messages.items():
+            for msg in messages:
+                received += self._enqueue(msg, chat)
+        if self.metrics:
+            self.metrics.inc('intake_polls_total', result='messages' if received else 'idle')
+        return received
@@ -0,0 +1,170 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# 延迟直方图默认分桶（秒）
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(labels):
+    """把标签元组格式化为 Prometheus 标签字符串"""
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Histogram:
+    """固定分桶的延迟直方图"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个是 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """根据分桶线性插值估算分位数"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bucket_count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if seen + bucket_count >= rank and bucket_count:
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+            lower = upper
+        return self.max
+
+
+class MetricsRegistry:
+    """计数器和直方图的注册表，线程安全"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters = {}  # (名称, 标签) -> 数值
+        self.histograms = {}  # (名称, 标签) -> Histogram
+        self.started_at = time.time()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, stage):
+        """统计某个处理阶段的调用次数、错误次数和耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("stage_errors_total", stage=stage)
+            raise
+        finally:
+            self.observe("stage_latency_seconds", time.perf_counter() - start, stage=stage)
+
+    def render(self):
+        """输出 Prometheus 文本格式"""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            histograms = [(key, h.buckets, list(h.counts), h.sum, h.count) for key, h in histograms]
+
+        typed = set()
+        for (name, labels), value in counters:
+            full_name = f"{self.prefix}_{name}"
+            if full_name not in typed:
+                lines.append(f"# TYPE {full_name} counter")
+                typed.add(full_name)
+            lines.append(f"{full_name}{_format_labels(labels)} {value}")
+
+        for (name, labels), buckets, counts, total, count in histograms:
+            full_name = f"{self.prefix}_{name}"
+            if full_name not in typed:
+                lines.append(f"# TYPE {full_name} histogram")
+                typed.add(full_name)
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                bucket_labels = labels + (("le", bound),)
+                lines.append(f"{full_name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{full_name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{full_name}_count{_format_labels(labels)} {count}")
+
+        uptime = time.time() - self.started_at
+        lines.append(f"# TYPE {self.prefix}_uptime_seconds gauge")
+        lines.append(f"{self.prefix}_uptime_seconds {uptime:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """生成便于阅读的各阶段统计，用于定期打印"""
+        with self.lock:
+            rows = [
+                (dict(labels).get("stage", name), h.count, h.sum, h.quantile(0.5), h.quantile(0.99))
+                for (name, labels), h in sorted(self.histograms.items(), key=lambda item: item[0])
+                if name == "stage_latency_seconds"
+            ]
+            errors = {
+                dict(labels).get("stage"): value
+                for (name, labels), value in self.counters.items()
+                if name == "stage_errors_total"
+            }
+
+        lines = []
+        for stage, count, total, p50, p99 in rows:
+            avg = total / count if count else 0.0
+            lines.append(
+                f"{stage}: 次数={count} 错误={errors.get(stage, 0)} "
+                f"平均={avg * 1000:.1f}ms p50={p50 * 1000:.1f}ms p99={p99 * 1000:.1f}ms"
+            )
+        return lines
+
+
+def install_flask_metrics(app, registry):
+    """为 Flask 应用添加按端点统计和 /metrics 接口"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("metrics_start", None)
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        if start is not None and endpoint != "/metrics":
+            registry.observe("http_request_latency_seconds",
+                             time.perf_counter() - start, endpoint=endpoint)
+            registry.inc("http_requests_total", endpoint=endpoint,
+                         method=request.method, status=response.status_code)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+# 优先级：数字越小越先处理
+PRIORITY_COMMAND = 0
+PRIORITY_MENTION = 1
+PRIORITY_LOG = 2
+PRIORITY_NAMES = {PRIORITY_COMMAND: "command", PRIORITY_MENTION: "mention", PRIORITY_LOG: "log"}
+
+
+class RateLimiter:
+    """按发送人的令牌桶限流，只保留最近活跃的发送人"""
+
+    def __init__(self, rate_limit=6, rate_period=60, max_senders=1000):
+        self.capacity = rate_limit
+        self.refill_per_second = rate_limit / rate_period if rate_period else 0
+        self.max_senders = max_senders
+        self.buckets = OrderedDict()  # 发送人 -> (剩余令牌, 上次更新时间)
+        self.lock = threading.Lock()
+
+    def allow(self, sender):
+        if not self.capacity:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.pop(sender, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets[sender] = (tokens, now)
+            while len(self.buckets) > self.max_senders:
+                self.buckets.popitem(last=False)
+            return allowed
+
+
+class MessageScheduler:
+    """按优先级分发任务，命令和@回复在发送人之间轮转，避免单个发送人占满处理线程
+
+    日志记录不参与轮转，由单独的写入线程严格按到达顺序处理，保证日志文件是时间顺序的。
+    """
+
+    def __init__(self, workers=4, rate_limit=6, command_rate_limit=10, rate_period=60,
+                 max_per_sender=20, max_log_queue=10000, metrics=None):
+        if workers < 2:
+            raise ValueError("workers 至少为 2，需要给命令保留一个处理线程")
+        self.workers = workers
+        self.max_per_sender = max_per_sender  # 每个发送人在回复类队列中最多排队的任务数
+        self.max_log_queue = max_log_queue
+        # 命令和@回复分开限流，频繁 /help 不会占用@回复的额度，反之亦然
+        self.limiters = {
+            PRIORITY_COMMAND: RateLimiter(command_rate_limit, rate_period),
+            PRIORITY_MENTION: RateLimiter(rate_limit, rate_period),
+        }
+        self.metrics = metrics
+        self.queues = {priority: OrderedDict() for priority in self.limiters}  # 发送人 -> deque[任务]
+        self.log_queue = deque()
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.log_condition = threading.Condition(self.lock)
+        self.idle_condition = threading.Condition(self.lock)  # 只用于 join，避免和处理线程抢通知
+        self.pending = 0
+        self.active = 0
+        # @回复通常要等大模型，最多占用 workers-1 个线程，给命令留出处理能力
+        self.active_by_priority = {priority: 0 for priority in self.limiters}
+        self.concurrency_limits = {PRIORITY_MENTION: workers - 1}
+        self.stopping = False
+        self.threads = []
+        self.log_thread = None
+
+    def _count(self, name, **labels):
+        if self.metrics:
+            self.metrics.inc(name, **labels)
+
+    def submit(self, priority, sender, func, *args):
+        """提交任务，被限流、队列已满或正在停止时返回 False"""
+        task = (time.perf_counter(), priority, func, args)
+        with self.lock:
+            if self.stopping:
+                # 处理线程可能已经退出，再接收任务会让 join 一直等下去
+                self._count("scheduler_rejected_total", priority=PRIORITY_NAMES[priority], reason="stopping")
+                return False
+            if priority == PRIORITY_LOG:
+                if len(self.log_queue) >= self.max_log_queue:
+                    self._count("scheduler_rejected_total", priority="log", reason="queue_full")
+                    return False
+                self.log_queue.append(task)
+                self.pending += 1
+                self.log_condition.notify()
+            else:
+                sender_queue = self.queues[priority].get(sender)
+                if sender_queue is not None and len(sender_queue) >= self.max_per_sender:
+                    self._count("scheduler_rejected_total", priority=PRIORITY_NAMES[priority], reason="queue_full")
+                    return False
+                # 先检查队列再扣令牌，被拒绝的请求不占用额度
+                if not self.limiters[priority].allow(sender):
+                    self._count("scheduler_rejected_total", priority=PRIORITY_NAMES[priority], reason="rate_limit")
+                    return False
+                if sender_queue is None:
+                    sender_queue = self.queues[priority][sender] = deque()
+                sender_queue.append(task)
+                self.pending += 1
+                self.condition.notify()
+        self._count("scheduler_submitted_total", priority=PRIORITY_NAMES[priority])
+        return True
+
+    def _next_task(self):
+        """取出下一个任务：先按优先级，再在发送人之间轮转（需持有锁）"""
+        for priority in sorted(self.queues):
+            senders = self.queues[priority]
+            limit = self.concurrency_limits.get(priority)
+            if senders and (limit is None or self.active_by_priority[priority] < limit):
+                sender, sender_queue = senders.popitem(last=False)
+                task = sender_queue.popleft()
+                if sender_queue:
+                    senders[sender] = sender_queue  # 放到队尾，轮到其他发送人
+                self.pending -= 1
+                return task
+        return None
+
+    def _run(self, task):
+        enqueued_at, priority, func, args = task
+        if self.metrics:
+            self.metrics.observe("queue_wait_seconds", time.perf_counter() - enqueued_at,
+                                 priority=PRIORITY_NAMES[priority])
+        try:
+            func(*args)
+        except Exception as e:
+            logging.error(f"调度任务执行失败: {str(e)}")
+
+    def _worker(self):
+        while True:
+            with self.lock:
+                task = self._next_task()
+                while task is None:
+                    if self.stopping:
+                        return
+                    self.condition.wait()
+                    task = self._next_task()
+                self.active += 1
+                self.active_by_priority[task[1]] += 1
+
+            try:
+                self._run(task)
+            finally:
+                with self.lock:
+                    self.active -= 1
+                    self.active_by_priority[task[1]] -= 1
+                    self.condition.notify_all()
+                    self._notify_if_idle()
+
+    def _log_writer(self):
+        """按到达顺序逐条处理日志任务"""
+        while True:
+            with self.lock:
+                while not self.log_queue:
+                    if self.stopping:
+                        return
+                    self.log_condition.wait()
+                task = self.log_queue.popleft()
+                self.pending -= 1
+                self.active += 1
+
+            try:
+                self._run(task)
+            finally:
+                with self.lock:
+                    self.active -= 1
+                    self._notify_if_idle()
+
+    def _notify_if_idle(self):
+        """队列清空且没有正在执行的任务时唤醒 join（需持有锁）"""
+        if not self.pending and not self.active:
+            self.idle_condition.notify_all()
+
+    def start(self):
+        """启动处理线程和日志写入线程"""
+        with self.lock:
+            self.stopping = False
+            self.threads = [thread for thread in self.threads if thread.is_alive()]
+            for _ in range(self.workers - len(self.threads)):
+                thread = threading.Thread(target=self._worker, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+            if self.log_thread is None or not self.log_thread.is_alive():
+                self.log_thread = threading.Thread(target=self._log_writer, daemon=True)
+                self.log_thread.start()
+
+    def stop(self):
+        """通知处理线程在队列清空后退出"""
+        with self.lock:
+            self.stopping = True
+            self.condition.notify_all()
+            self.log_condition.notify_all()
+
+    def join(self, timeout=None):
+        """等待所有已提交的任务处理完，返回是否全部完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            while self.pending or self.active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.idle_condition.wait(remaining)
+        return True
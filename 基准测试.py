@@ -0,0 +1,414 @@
+"""
+端到端压测脚本：用替身对象代替微信客户端和DeepSeek接口，
+依次压测 监听端、/ai/ask 和 /db/search，输出吞吐量、回复延迟和内存占用。
+
+用法示例：
+    python 基准测试.py --messages 500 --rate 50 --llm-latency 200
+    python 基准测试.py --replay wechat_messages.log --my-name 小助手
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TOKEN_PATTERN = re.compile(r"#bench(\d+)")
+
+KEYWORDS = ["部署", "报销", "请假", "python", "数据库", "服务器", "打卡", "会议室"]
+CHATTER = ["收到", "好的", "今天中午吃什么", "哈哈哈", "明天几点开会", "这个需求谁跟进一下", "👍"]
+
+
+def free_port():
+    """获取一个空闲的本地端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, q):
+    """计算分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+def current_rss_kb():
+    """当前进程常驻内存（KB），非Linux环境退化为历史峰值"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """模拟DeepSeek接口：按配置的延迟返回用户消息的回声"""
+    latency = 0.2
+    jitter = 0.0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            messages = json.loads(body).get("messages", [])
+            prompt = messages[-1]["content"] if messages else ""
+        except (ValueError, KeyError, IndexError):
+            prompt = ""
+
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        payload = json.dumps({
+            "choices": [{"message": {"role": "assistant", "content": f"收到：{prompt}"}}]
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeMessage:
+    """模拟wxauto消息对象"""
+
+    def __init__(self, sender, content, index=None):
+        self.sender = sender
+        self.content = content
+        self.index = index  # 回放序号，用于统计接入延迟
+
+
+class FakeWeChat:
+    """模拟wxauto.WeChat：记录发送的消息，并把回放的消息交给监听回调或轮询缓冲区"""
+
+    def __init__(self):
+        self.callbacks = {}
+        self.polled = {}  # 轮询方式监听的群聊 -> 待拉取的消息
+        self.sent = []
+        self.reply_times = {}
+        self.lock = threading.Lock()
+
+    def AddListenChat(self, nickname=None, callback=None, who=None):
+        if callback is None:
+            with self.lock:
+                self.polled[who or nickname] = []
+        else:
+            self.callbacks[nickname] = callback
+
+    def RemoveListenChat(self, nickname):
+        self.callbacks.pop(nickname, None)
+        with self.lock:
+            self.polled.pop(nickname, None)
+
+    def GetListenMessage(self):
+        with self.lock:
+            messages = {chat: items for chat, items in self.polled.items() if items}
+            for chat in messages:
+                self.polled[chat] = []
+        return messages
+
+    def SendMsg(self, msg, who=None):
+        now = time.perf_counter()
+        with self.lock:
+            self.sent.append((who, msg))
+            match = TOKEN_PATTERN.search(msg)
+            if match:
+                self.reply_times.setdefault(int(match.group(1)), now)
+
+    def replay(self, group_name, messages, rate=0):
+        """按指定速率（条/秒，0表示不限速）回放消息，返回每条消息的投递时间
+
+        非命令消息末尾会追加 #bench序号，替身大模型原样回显，用于匹配回复和计算延迟。
+        """
+        callback = self.callbacks.get(group_name)
+        sent_times = {}
+        start = time.perf_counter()
+        for index, (sender, content) in enumerate(messages):
+            if rate:
+                delay = start + index / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            sent_times[index] = time.perf_counter()
+            if not content.startswith("/"):
+                content = f"{content} #bench{index}"
+            message = FakeMessage(sender, content, index)
+            if callback:
+                callback(message, group_name)
+            else:
+                with self.lock:
+                    self.polled[group_name].append(message)
+        return sent_times
+
+
+def synthetic_messages(count, senders, my_name, mention_ratio, command_ratio, seed=0):
+    """生成模拟群聊流量"""
+    rng = random.Random(seed)
+    names = [f"用户{i}" for i in range(senders)]
+    messages = []
+    for _ in range(count):
+        sender = rng.choice(names)
+        roll = rng.random()
+        if roll < command_ratio:
+            content = "/help"
+        elif roll < command_ratio + mention_ratio:
+            content = f"@{my_name} {rng.choice(KEYWORDS)}的流程是什么？"
+        else:
+            content = rng.choice(CHATTER)
+        messages.append((sender, content))
+    return messages
+
+
+def load_replay(path):
+    """读取录制的消息：支持监听端的日志文件格式或每行一个JSON对象"""
+    messages = []
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    messages.append((item["sender"], item["content"]))
+            return messages
+
+        sender = None
+        for line in f:
+            if line.startswith("发送人: "):
+                sender = line[len("发送人: "):].rstrip("\n")
+            elif line.startswith("内容: ") and sender is not None:
+                messages.append((sender, line[len("内容: "):].rstrip("\n")))
+                sender = None
+    return messages
+
+
+def reset_peak():
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+
+def traced_peak():
+    return tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+
+
+def start_server(app, port):
+    """在后台线程中启动Flask应用"""
+    from werkzeug.serving import make_server
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_http_load(url, payloads, concurrency):
+    """并发请求某个接口，返回每个请求的耗时和总耗时"""
+    import requests
+    session_local = threading.local()
+
+    def send(payload):
+        session = getattr(session_local, "session", None)
+        if session is None:
+            session = session_local.session = requests.Session()
+        start = time.perf_counter()
+        response = session.post(url, json=payload, timeout=60)
+        return time.perf_counter() - start, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, payloads))
+    elapsed = time.perf_counter() - start
+    return [latency for latency, _ in results], sum(1 for _, code in results if code != 200), elapsed
+
+
+def summarize(name, count, elapsed, latencies, errors=0, peak_memory=0):
+    """汇总一个压测阶段的结果"""
+    return {
+        "phase": name,
+        "count": count,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(count / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "peak_python_memory_kb": peak_memory // 1024,
+        "rss_kb": current_rss_kb(),
+    }
+
+
+def bench_listener(listener_module, args, messages):
+    """回放群聊消息到监听端，统计回复延迟"""
+    fake_wx = FakeWeChat()
+    logger = listener_module.WeChatMessageLogger(
+        "bench_messages.log", args.api_key, args.my_name, stats_interval=0, wx=fake_wx,
+        workers=args.workers, rate_limit=args.rate_limit, intake_mode=args.intake_mode)
+    logger.reply_mode = args.reply_mode
+
+    # 记录每条消息分发处理完（提交到调度器）的时间，接入延迟 = 处理完成 - 投递
+    handled_times = {}
+    handle_message = logger._handle_message
+
+    def timed_handle(msg, chat, log_callback, chat_name):
+        handle_message(msg, chat, log_callback, chat_name)
+        handled_times[msg.index] = time.perf_counter()
+
+    logger._handle_message = timed_handle
+    logger.start_listening(args.group, log_callback=lambda message: None)
+
+    sent_times = fake_wx.replay(args.group, messages, args.rate)
+
+    # 轮询方式下先等监听端把缓冲区里的消息拉走
+    deadline = time.monotonic() + args.timeout
+    while fake_wx.polled.get(args.group) and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    # 等待所有消息处理完（被限流的@消息不会有回复，计入失败）
+    logger.wait_idle(max(0, deadline - time.monotonic()))
+    logger.stop_listening()
+
+    expected = {index for index, (_, content) in enumerate(messages) if f"@{args.my_name}" in content}
+    with fake_wx.lock:
+        latencies = [fake_wx.reply_times[i] - sent_times[i] for i in expected if i in fake_wx.reply_times]
+        last_reply = max(fake_wx.reply_times.values(), default=None)
+    missing = len(expected) - len(latencies)
+    total_elapsed = last_reply - sent_times[0] if last_reply and sent_times else 0.0
+
+    intake_latencies = [handled_times[i] - sent_times[i] for i in handled_times]
+    intake_elapsed = max(handled_times.values()) - sent_times[0] if handled_times else 0.0
+    intake = summarize("listener_intake", len(intake_latencies), intake_elapsed, intake_latencies,
+                       errors=len(messages) - len(intake_latencies))
+    replies = summarize("listener_replies", len(latencies), total_elapsed, latencies, errors=missing)
+    return [intake, replies]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="微信AI助手端到端压测")
+    parser.add_argument("--messages", type=int, default=300, help="模拟消息数量")
+    parser.add_argument("--rate", type=float, default=0, help="消息回放速率（条/秒），0表示不限速")
+    parser.add_argument("--senders", type=int, default=20, help="模拟发送人数量")
+    parser.add_argument("--mention-ratio", type=float, default=0.3, help="@机器人的消息比例")
+    parser.add_argument("--command-ratio", type=float, default=0.02, help="命令消息比例")
+    parser.add_argument("--replay", help="回放录制的消息文件（监听日志或.jsonl）")
+    parser.add_argument("--my-name", default="小助手", help="机器人的微信昵称")
+    parser.add_argument("--group", default="压测群", help="模拟群聊名称")
+    parser.add_argument("--api-key", default="bench-key", help="传给监听端的API密钥")
+    parser.add_argument("--reply-mode", choices=["api", "local"], default="api", help="监听端回复模式")
+    parser.add_argument("--intake-mode", choices=["callback", "poll"], default="callback",
+                        help="监听端消息接入方式")
+    parser.add_argument("--workers", type=int, default=8, help="监听端调度器处理线程数")
+    parser.add_argument("--rate-limit", type=int, default=6, help="每个发送人每分钟最多触发的回复数，0表示不限")
+    parser.add_argument("--llm-latency", type=float, default=200, help="模拟大模型延迟（毫秒）")
+    parser.add_argument("--llm-jitter", type=float, default=50, help="模拟大模型延迟抖动（毫秒）")
+    parser.add_argument("--requests", type=int, default=200, help="每个HTTP接口的请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="HTTP压测并发数")
+    parser.add_argument("--entries", type=int, default=500, help="预置知识条目数量")
+    parser.add_argument("--timeout", type=float, default=120, help="等待回复的最长时间（秒）")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="用tracemalloc统计每个阶段的Python内存峰值（会明显降低吞吐）")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        args.replay = os.path.abspath(args.replay)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    workdir = tempfile.mkdtemp(prefix="wxbot-bench-")
+    real_stdout = sys.stdout
+    sys.path.insert(0, BASE_DIR)
+    os.chdir(workdir)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    # 启动替身大模型服务
+    StubLLMHandler.latency = args.llm_latency / 1000
+    StubLLMHandler.jitter = args.llm_jitter / 1000
+    llm_server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLMHandler)
+    llm_server.daemon_threads = True
+    threading.Thread(target=llm_server.serve_forever, daemon=True).start()
+    llm_url = f"http://127.0.0.1:{llm_server.server_address[1]}/chat/completions"
+
+    db_port, ai_port = free_port(), free_port()
+    os.environ["KNOWLEDGE_DB_PATH"] = os.path.join(workdir, "knowledge.db")
+    os.environ["KNOWLEDGE_DB_URL"] = f"http://127.0.0.1:{db_port}"
+    os.environ["DEEPSEEK_API_URL"] = llm_url
+
+    results = []
+    if args.trace_memory:
+        tracemalloc.start()
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        db_module = importlib.import_module("数据库端")
+        server_module = importlib.import_module("服务器端")
+        server_module.DEEPSEEK_API_KEY = args.api_key
+        listener_module = importlib.import_module("监听端")
+        listener_module.DEEPSEEK_API_URL = llm_url
+        listener_module.LOCAL_API_URL = f"http://127.0.0.1:{ai_port}/ai/ask"
+
+        for i in range(args.entries):
+            keyword = KEYWORDS[i % len(KEYWORDS)]
+            db_module.text_db.add_entry(f"{keyword}{i}" if i >= len(KEYWORDS) else keyword,
+                                        f"关于{keyword}的说明第{i}条：请联系管理员处理相关流程。")
+        db_server = start_server(db_module.app, db_port)
+        ai_server = start_server(server_module.app, ai_port)
+
+        if args.replay:
+            messages = load_replay(args.replay)
+        else:
+            messages = synthetic_messages(args.messages, args.senders, args.my_name,
+                                          args.mention_ratio, args.command_ratio)
+
+        reset_peak()
+        phase = bench_listener(listener_module, args, messages)
+        peak = traced_peak()
+        for item in phase:
+            item["peak_python_memory_kb"] = peak // 1024
+        results.extend(phase)
+
+        questions = [{"question": f"{KEYWORDS[i % len(KEYWORDS)]}怎么办理？#bench{i}"}
+                     for i in range(args.requests)]
+        reset_peak()
+        latencies, errors, elapsed = run_http_load(
+            f"http://127.0.0.1:{ai_port}/ai/ask", questions, args.concurrency)
+        results.append(summarize("ai_ask", len(questions), elapsed, latencies, errors, traced_peak()))
+
+        queries = [{"query": f"{KEYWORDS[i % len(KEYWORDS)]}相关规定"} for i in range(args.requests)]
+        reset_peak()
+        latencies, errors, elapsed = run_http_load(
+            f"http://127.0.0.1:{db_port}/db/search", queries, args.concurrency)
+        results.append(summarize("db_search", len(queries), elapsed, latencies, errors, traced_peak()))
+
+        db_server.shutdown()
+        ai_server.shutdown()
+        llm_server.shutdown()
+    if args.trace_memory:
+        tracemalloc.stop()
+
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report = {"results": results, "max_rss_kb": max_rss_kb, "workdir": workdir}
+
+    print(f"{'阶段':<18}{'数量':>8}{'失败':>6}{'吞吐(/s)':>12}{'p50(ms)':>10}{'p99(ms)':>10}"
+          f"{'RSS(KB)':>10}{'Python峰值(KB)':>16}", file=real_stdout)
+    for item in results:
+        print(f"{item['phase']:<20}{item['count']:>8}{item['errors']:>6}{item['throughput_per_s']:>12}"
+              f"{item['p50_ms']:>10}{item['p99_ms']:>10}{item['rss_kb']:>10}"
+              f"{item['peak_python_memory_kb']:>16}", file=real_stdout)
+    print(f"进程最大常驻内存: {max_rss_kb} KB", file=real_stdout)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
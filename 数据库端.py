@@ -5,8 +5,11 @@ import threading
 import re
 import os
 import time
+from metrics import MetricsRegistry, install_flask_metrics
 
 app = Flask(__name__)
+metrics = MetricsRegistry('knowledge_db')
+install_flask_metrics(app, metrics)
 
 
 class TextDB:
@@ -65,9 +68,10 @@ class TextDB:
 
     def contains_keywords(self, query):
         """检查查询是否包含任何关键词"""
-        self._refresh_keyword_cache()
-        query_lower = query.lower()
-        return any(keyword in query_lower for keyword in self.keyword_cache)
+        with metrics.timer('keyword_gate'):
+            self._refresh_keyword_cache()
+            query_lower = query.lower()
+            return any(keyword in query_lower for keyword in self.keyword_cache)
 
     def add_entry(self, key_text, content):
         """添加知识条目并刷新缓存"""
@@ -84,10 +88,12 @@ class TextDB:
     def search_entries(self, query, top_n=3):
         """优化版知识检索 - 增强语义匹配"""
         if not self.contains_keywords(query):
+            metrics.inc('keyword_gate_total', result='miss')
             print(f"查询不包含关键词: '{query}'")
             return []
+        metrics.inc('keyword_gate_total', result='hit')
 
-        with self.lock:
+        with metrics.timer('search_scoring'), self.lock:
             cursor = self.conn.cursor()
             cursor.execute('SELECT id, key_text, content FROM knowledge')
             results = []
@@ -132,7 +138,7 @@ class TextDB:
         results.sort(key=lambda x: x['score'], reverse=True)
 
         # 更新访问记录
-        with self.lock:
+        with metrics.timer('access_update'), self.lock:
             for item in results[:top_n]:
                 cursor.execute('''
                                UPDATE knowledge
@@ -147,7 +153,7 @@ class TextDB:
 
 
 # 初始化数据库
-text_db = TextDB()
+text_db = TextDB(os.environ.get('KNOWLEDGE_DB_PATH', 'knowledge.db'))
 
 
 # API路由
@@ -3,12 +3,26 @@ import requests
 import traceback
 import os
 import time
+from metrics import MetricsRegistry, install_flask_metrics
+from context import ContextBuilder, ConversationMemory
 
 app = Flask(__name__)
+metrics = MetricsRegistry('ai_server')
+install_flask_metrics(app, metrics)
 
 # 配置DeepSeek API密钥
 DEEPSEEK_API_KEY = "你的deepseekapi"  # 替换为你的DeepSeek API密钥
 
+# 服务地址，可通过环境变量覆盖
+DEEPSEEK_API_URL = os.environ.get('DEEPSEEK_API_URL', "https://api.deepseek.com/v1/chat/completions")
+KNOWLEDGE_DB_URL = os.environ.get('KNOWLEDGE_DB_URL', "http://localhost:6000")
+
+# 上下文组装：限制发给DeepSeek的token数，并按 (群聊, 发送人) 保存最近几轮对话
+context_builder = ContextBuilder(
+    token_budget=3000,
+    memory=ConversationMemory(max_turns=4, max_sessions=1000, idle_seconds=3600)
+)
+
 # 关键词缓存和刷新机制
 keyword_cache = set()
 last_keyword_refresh = 0
@@ -18,7 +32,7 @@ def refresh_keyword_cache():
     """从数据库服务刷新关键词缓存"""
     global keyword_cache, last_keyword_refresh
     try:
-        response = requests.get('http://localhost:6000/db/keywords', timeout=2)
+        response = requests.get(f"{KNOWLEDGE_DB_URL}/db/keywords", timeout=2)
         if response.status_code == 200:
             data = response.json()
             if data['status'] == 'success':
@@ -33,12 +47,13 @@ def contains_keywords(question):
     """检查问题是否包含关键词"""
     global keyword_cache, last_keyword_refresh
 
-    # 每小时刷新一次缓存
-    if time.time() - last_keyword_refresh > 3600:
-        refresh_keyword_cache()
+    with metrics.timer('keyword_gate'):
+        # 每小时刷新一次缓存
+        if time.time() - last_keyword_refresh > 3600:
+            refresh_keyword_cache()
 
-    question_lower = question.lower()
-    return any(keyword in question_lower for keyword in keyword_cache)
+        question_lower = question.lower()
+        return any(keyword in question_lower for keyword in keyword_cache)
 
 
 @app.route('/ai/ask', methods=['POST'])
@@ -50,18 +65,22 @@ def ask_question():
             return jsonify({'status': 'error', 'message': '缺少question参数'}), 400
 
         question = data['question']
+        # 可选的会话标识，用于关联同一个人的追问
+        session_key = (data.get('chat', ''), data['sender']) if data.get('sender') else None
         print(f"\n===== 收到问题: {question[:50]}{'...' if len(question) > 50 else ''} =====")
 
         # 智能判断是否需要查询数据库
         knowledge = []
-        if contains_keywords(question):
+        keywords_used = contains_keywords(question)
+        if keywords_used:
             print("问题包含关键词，正在查询数据库...")
             try:
-                db_response = requests.post(
-                    "http://localhost:6000/db/search",
-                    json={'query': question},
-                    timeout=2
-                )
+                with metrics.timer('db_search'):
+                    db_response = requests.post(
+                        f"{KNOWLEDGE_DB_URL}/db/search",
+                        json={'query': question},
+                        timeout=2
+                    )
 
                 if db_response.status_code == 200:
                     db_data = db_response.json()
@@ -77,39 +96,38 @@ def ask_question():
         else:
             print("问题不包含已知关键词，跳过数据库查询")
 
-        # 构建系统提示
+        # 构建系统提示，按匹配分数在token预算内挑选知识片段，并附上最近的对话
         system_prompt = "你是一个知识丰富的AI助手，请根据以下信息回答问题：" #ai人格编辑
-        if knowledge:
-            system_prompt += "\n\n相关背景：\n" + "\n".join(
-                [f"- {item['content']}" for item in knowledge]
+        with metrics.timer('context_build'):
+            messages, snippets = context_builder.build(
+                system_prompt,
+                question,
+                key=session_key,
+                knowledge=knowledge,
+                fallback_hint="\n当前没有相关背景信息，请根据你的知识回答。"
             )
-        else:
-            system_prompt += "\n当前没有相关背景信息，请根据你的知识回答。"
+        system_prompt = messages[0]['content']
 
         print(f"系统提示: {system_prompt[:150]}{'...' if len(system_prompt) > 150 else ''}")
 
-        # 调用DeepSeek生成回答
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": question}
-        ]
-
         try:
-            response = requests.post(
-                "https://api.deepseek.com/v1/chat/completions",
-                headers={"Authorization": f"Bearer {DEEPSEEK_API_KEY}"},
-                json={
-                    "model": "deepseek-chat",
-                    "messages": messages,
-                    "temperature": 0.7,
-                    "max_tokens": 1000
-                },
-                timeout=15
-            )
+            with metrics.timer('deepseek_call'):
+                response = requests.post(
+                    DEEPSEEK_API_URL,
+                    headers={"Authorization": f"Bearer {DEEPSEEK_API_KEY}"},
+                    json={
+                        "model": "deepseek-chat",
+                        "messages": messages,
+                        "temperature": 0.7,
+                        "max_tokens": 1000
+                    },
+                    timeout=15
+                )
 
             # 检查DeepSeek API响应
             if response.status_code != 200:
                 error_msg = f"DeepSeek API错误: {response.status_code}"
+                metrics.inc('deepseek_failures_total', reason=response.status_code)
                 print(error_msg)
                 # 尝试使用知识库中的第一条作为回复
                 if knowledge:
@@ -130,14 +148,16 @@ def ask_question():
             response_data = response.json()
             reply = response_data['choices'][0]['message']['content']
             print(f"生成回复: {reply[:100]}{'...' if len(reply) > 100 else ''}")
+            context_builder.record(session_key, question, reply)
 
             return jsonify({
                 'status': 'success',
                 'reply': reply,
-                'used_knowledge': [item['content'] for item in knowledge] if knowledge else [],
-                'keywords_used': contains_keywords(question)
+                'used_knowledge': [item['content'] for item in snippets],
+                'keywords_used': keywords_used
             })
         except Exception as e:
+            metrics.inc('deepseek_failures_total', reason=type(e).__name__)
             print(f"DeepSeek API调用异常: {str(e)}")
             # 如果调用失败，尝试使用知识库作为回复
             if knowledge:
@@ -0,0 +1,182 @@
+import tkinter as tk
+from tkinter import ttk, scrolledtext, messagebox
+
+
+class AnimatedButton(tk.Button):
+    """自定义动画按钮"""
+
+    def __init__(self, master=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.default_bg = self["bg"]
+        self.bind("<Enter>", self.on_enter)
+        self.bind("<Leave>", self.on_leave)
+
+    def on_enter(self, e):
+        self["bg"] = self["activebackground"]
+
+    def on_leave(self, e):
+        self["bg"] = self.default_bg
+
+
+class WeChatListenerUI:
+    def __init__(self, master, logger_factory):
+        self.master = master
+        # 由监听端传入 WeChatMessageLogger，避免本模块再导入一次监听端
+        self.logger_factory = logger_factory
+        master.title("微信AI助手")
+        master.geometry("800x600")
+
+        # 初始化日志器
+        self.logger = None
+
+        # 创建UI元素
+        self.create_widgets()
+
+    def create_widgets(self):
+        # 配置区域
+        config_frame = ttk.LabelFrame(self.master, text="配置", padding=10)
+        config_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        # API密钥输入
+        ttk.Label(config_frame, text="DeepSeek API密钥:").grid(row=0, column=0, sticky=tk.W)
+        self.api_key_entry = ttk.Entry(config_frame, width=50)
+        self.api_key_entry.grid(row=0, column=1, padx=5, pady=5)
+
+        # 我的微信昵称
+        ttk.Label(config_frame, text="我的微信昵称:").grid(row=1, column=0, sticky=tk.W)
+        self.my_name_entry = ttk.Entry(config_frame, width=30)
+        self.my_name_entry.grid(row=1, column=1, padx=5, pady=5, sticky=tk.W)
+
+        # 日志文件路径
+        ttk.Label(config_frame, text="日志文件路径:").grid(row=2, column=0, sticky=tk.W)
+        self.log_path_entry = ttk.Entry(config_frame, width=50)
+        self.log_path_entry.grid(row=2, column=1, padx=5, pady=5)
+        self.log_path_entry.insert(0, "wechat_messages.log")
+
+        # 监听群聊名称
+        ttk.Label(config_frame, text="监听群聊名称:").grid(row=3, column=0, sticky=tk.W)
+        self.group_name_entry = ttk.Entry(config_frame, width=30)
+        self.group_name_entry.grid(row=3, column=1, padx=5, pady=5, sticky=tk.W)
+
+        # 按钮区域
+        button_frame = ttk.Frame(self.master)
+        button_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        self.start_btn = AnimatedButton(
+            button_frame,
+            text="开始监听",
+            command=self.start_listening,
+            bg="#4CAF50",
+            fg="white",
+            activebackground="#45a049"
+        )
+        self.start_btn.pack(side=tk.LEFT, padx=5)
+
+        self.stop_btn = AnimatedButton(
+            button_frame,
+            text="停止监听",
+            command=self.stop_listening,
+            bg="#f44336",
+            fg="white",
+            activebackground="#d32f2f"
+        )
+        self.stop_btn.pack(side=tk.LEFT, padx=5)
+
+        self.help_btn = AnimatedButton(
+            button_frame,
+            text="帮助",
+            command=self.show_help,
+            bg="#2196F3",
+            fg="white",
+            activebackground="#0b7dda"
+        )
+        self.help_btn.pack(side=tk.LEFT, padx=5)
+
+        # 日志显示区域
+        log_frame = ttk.LabelFrame(self.master, text="日志", padding=10)
+        log_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.log_text = scrolledtext.ScrolledText(log_frame, height=15)
+        self.log_text.pack(fill=tk.BOTH, expand=True)
+
+    def start_listening(self):
+        """开始监听按钮事件"""
+        api_key = self.api_key_entry.get().strip()
+        my_name = self.my_name_entry.get().strip()
+        log_path = self.log_path_entry.get().strip()
+        group_name = self.group_name_entry.get().strip()
+
+        if not all([api_key, my_name, log_path, group_name]):
+            messagebox.showerror("错误", "请填写所有必填字段!")
+            return
+
+        if not self.logger:
+            self.logger = self.logger_factory(log_path, api_key, my_name)
+
+        self.logger.start_listening(group_name, self.log_callback)
+        self.log_callback(f"[系统] 正在启动监听: {group_name}")
+        self.log_callback(f"[系统] 在群聊中输入 '/help' 查看可用命令")
+
+    def stop_listening(self):
+        """停止监听按钮事件"""
+        if hasattr(self, 'logger') and self.logger:
+            self.logger.stop_listening()
+            self.log_callback("[系统] 已停止监听")
+
+    def show_help(self):
+        """显示帮助信息"""
+        help_window = tk.Toplevel(self.master)
+        help_window.title("使用帮助")
+        help_window.geometry("600x400")
+
+        help_text = """
+        ========== 微信AI助手 使用说明 ==========
+
+        1. 配置信息:
+          - DeepSeek API密钥: 从DeepSeek官网获取的API密钥
+          - 我的微信昵称: 在微信中使用的昵称
+          - 日志文件路径: 消息日志保存的文件路径
+          - 监听群聊名称: 要监听的微信群聊名称
+
+        2. 操作步骤:
+          a) 填写所有必填字段
+          b) 点击"开始监听"按钮
+          c) 程序将在后台监听指定群聊的消息
+
+        3. 群聊命令:
+          /api chat - 切换到DeepSeek API回复模式
+          /local chat - 切换到本地AI回复模式
+          /help - 显示帮助信息
+
+        4. 使用AI功能:
+          在群聊中 @你的昵称 + 问题，AI会自动回复
+
+        5. 停止监听:
+          点击"停止监听"按钮可以停止消息监听
+
+        6. 注意事项:
+          - 确保微信桌面版已登录并保持运行
+          - 本地AI服务需在 http://localhost:5000 运行
+          - 使用API模式需要有效的DeepSeek API密钥
+
+        7. 日志功能:
+          所有消息和系统事件都会记录在日志区域和日志文件中
+        """
+
+        help_text_area = scrolledtext.ScrolledText(help_window, wrap=tk.WORD)
+        help_text_area.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        help_text_area.insert(tk.INSERT, help_text)
+        help_text_area.configure(state='disabled')
+
+        close_btn = ttk.Button(
+            help_window,
+            text="关闭",
+            command=help_window.destroy
+        )
+        close_btn.pack(pady=10)
+
+    def log_callback(self, message):
+        """日志回调函数"""
+        self.log_text.insert(tk.END, message + "\n")
+        self.log_text.see(tk.END)
+        self.log_text.update()
@@ -1,47 +1,59 @@
-import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
-import threading
 import time
+
+_PROCESS_START = time.perf_counter()
+
+import argparse
+import threading
 import os
 import logging
+import signal
 from datetime import datetime
 import sys
-from wxauto import WeChat
-import requests
 import json
+from metrics import MetricsRegistry
+from context import ContextBuilder, ConversationMemory
+from scheduler import MessageScheduler, PRIORITY_COMMAND, PRIORITY_MENTION, PRIORITY_LOG
+from intake import IntakeEngine
 
 # API 配置
 DEEPSEEK_API_URL = "https://api.deepseek.com/chat/completions"
 DEEPSEEK_MODEL = "deepseek-chat"
 LOCAL_API_URL = "http://localhost:5000/ai/ask"
+SYSTEM_PROMPT = "你是一个微信聊天助手，请用简洁友好的方式回复用户的问题。"
+COMMANDS = ("/local chat", "/api chat", "/help")
 
-
-class AnimatedButton(tk.Button):
-    """自定义动画按钮"""
-
-    def __init__(self, master=None, **kwargs):
-        super().__init__(master, **kwargs)
-        self.default_bg = self["bg"]
-        self.bind("<Enter>", self.on_enter)
-        self.bind("<Leave>", self.on_leave)
-
-    def on_enter(self, e):
-        self["bg"] = self["activebackground"]
-
-    def on_leave(self, e):
-        self["bg"] = self.default_bg
+# 运行指标，按处理阶段统计耗时
+metrics = MetricsRegistry('wechat_listener')
 
 
 class WeChatMessageLogger:
-    def __init__(self, log_file_path, api_key, my_name):
+    def __init__(self, log_file_path, api_key, my_name, stats_interval=300, wx=None,
+                 workers=8, rate_limit=6, command_rate_limit=10, rate_period=60,
+                 intake_mode="callback"):
         self.log_file_path = os.path.abspath(log_file_path)
-        self.wx = WeChat()
+        if wx is None:
+            # 延迟导入，便于在没有微信客户端的环境中传入替身对象
+            from wxauto import WeChat
+            wx = WeChat()
+        self.wx = wx
         self.running = False
-        self.listener_thread = None
+        self.intake = None
+        self.intake_mode = intake_mode  # callback: wxauto 4 回调；poll: wxauto 3.9 GetListenMessage 轮询
         self.api_key = api_key
         self.my_name = my_name
         self.current_group = None
         self.reply_mode = "api"
+        self.stats_interval = stats_interval  # 定期输出统计的间隔（秒），0 表示关闭
+        self._stats_stop = threading.Event()
+        # API模式下按 (群聊, 发送人) 保存最近几轮对话，追问时带上上下文
+        self.context_builder = ContextBuilder(
+            token_budget=1500,
+            memory=ConversationMemory(max_turns=4, max_sessions=500, idle_seconds=1800)
+        )
+        # 命令优先、@回复其次，在发送人之间轮转并分别限流；日志由单独线程按到达顺序写入
+        self.scheduler = MessageScheduler(
+            workers=workers, rate_limit=rate_limit, command_rate_limit=command_rate_limit,
+            rate_period=rate_period, metrics=metrics)
         self._ensure_log_file()
 
         logging.basicConfig(
@@ -70,7 +82,7 @@ class WeChatMessageLogger:
         except Exception as e:
             logging.error(f"更新日志头部信息失败: {str(e)}")
 
-    def call_deepseek_api(self, prompt):
+    def call_deepseek_api(self, prompt, session_key=None):
         """调用DeepSeek API"""
         if not self.api_key:
             logging.warning("未提供API密钥")
@@ -81,35 +93,43 @@ class WeChatMessageLogger:
             "Content-Type": "application/json"
         }
 
+        messages, _ = self.context_builder.build(SYSTEM_PROMPT, prompt, key=session_key)
         payload = {
             "model": DEEPSEEK_MODEL,
-            "messages": [
-                {"role": "system", "content": "你是一个微信聊天助手，请用简洁友好的方式回复用户的问题。"},
-                {"role": "user", "content": prompt}
-            ],
+            "messages": messages,
             "temperature": 0.7,
             "max_tokens": 500
         }
 
+        import requests  # 延迟导入，缩短启动时间
+
         try:
-            response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            result = response.json()
-            return result['choices'][0]['message']['content'] if 'choices' in result else "抱歉，我无法理解这个问题。"
+            with metrics.timer('deepseek_api'):
+                response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload, timeout=30)
+                response.raise_for_status()
+                result = response.json()
+            if 'choices' not in result:
+                return "抱歉，我无法理解这个问题。"
+            reply = result['choices'][0]['message']['content']
+            self.context_builder.record(session_key, prompt, reply)
+            return reply
         except Exception as e:
             logging.error(f"API调用失败: {str(e)}")
             return "处理回复时发生错误，请稍后再试。"
 
-    def call_local_api(self, prompt):
-        """调用本地服务器API"""
+    def call_local_api(self, prompt, chat_name=None, sender=None):
+        """调用本地服务器API（对话历史由服务器端按群聊和发送人保存）"""
+        import requests  # 延迟导入，缩短启动时间
+
         try:
-            response = requests.post(
-                LOCAL_API_URL,
-                json={'question': prompt},
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()["reply"]
+            with metrics.timer('local_api'):
+                response = requests.post(
+                    LOCAL_API_URL,
+                    json={'question': prompt, 'chat': chat_name, 'sender': sender},
+                    timeout=30
+                )
+                response.raise_for_status()
+                return response.json()["reply"]
         except requests.exceptions.RequestException as e:
             logging.error(f"本地API调用失败: {str(e)}")
             return "无法连接到本地AI服务，请检查服务器是否运行。"
@@ -127,11 +147,26 @@ class WeChatMessageLogger:
         self.current_group = group_name
         self.running = True
         self.update_log_header(group_name)
+        self.scheduler.start()
+
+        # 使用wxauto的官方监听方式，消息先入队，由接入引擎分发
+        intake = IntakeEngine(
+            self.wx,
+            lambda msg, chat: self._handle_message(msg, chat, log_callback, group_name),
+            mode=self.intake_mode,
+            metrics=metrics,
+            on_stopped=lambda: self._on_intake_stopped(intake)
+        )
+        self.intake = intake
+        intake.start(group_name)
 
-        # 使用wxauto的官方监听方式
-        self.wx.AddListenChat(
-            nickname=group_name,
-            callback=lambda msg, chat: self.on_message(msg, chat, log_callback))
+        if self.stats_interval:
+            self._stats_stop.clear()
+            threading.Thread(
+                target=self._stats_loop,
+                args=(log_callback,),
+                daemon=True
+            ).start()
 
         if log_callback:
             log_callback(f"[系统] 开始监听群聊: {group_name}")
@@ -139,72 +174,84 @@ class WeChatMessageLogger:
     def stop_listening(self):
         """停止监听"""
         if self.running:
+            # 注销监听后立即返回，不阻塞界面线程；已入队的消息处理完后再停止调度器
             self.running = False
-            # wxauto没有提供直接的停止监听方法，我们通过标志位控制
+            self._stats_stop.set()
+            self.intake.stop()
             self.current_group = None
 
-    def on_message(self, msg, chat, log_callback):
-        """消息回调函数 - 适配wxauto消息对象"""
-        if not self.running:
-            return
+    def _on_intake_stopped(self, intake):
+        """接入引擎处理完剩余消息后调用（在分发线程中）"""
+        if self.intake is intake and not self.running:
+            self.scheduler.stop()
+
+    def wait_idle(self, timeout=None):
+        """等待已收到的消息全部处理完，返回是否在超时前完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self.intake and not self.intake.join(timeout):
+            return False
+        remaining = None if deadline is None else max(0, deadline - time.monotonic())
+        return self.scheduler.join(remaining)
+
+    def pending_tasks(self):
+        """尚未处理完的消息和任务数"""
+        queued = self.intake.pending() if self.intake else 0
+        return queued + self.scheduler.pending + self.scheduler.active
+
+    def _stats_loop(self, log_callback=None):
+        """定期输出各处理阶段的统计信息"""
+        while not self._stats_stop.wait(self.stats_interval):
+            self.dump_stats(log_callback)
+
+    def dump_stats(self, log_callback=None):
+        """输出当前统计信息"""
+        for line in metrics.summary():
+            logging.info(f"[统计] {line}")
+            if log_callback:
+                log_callback(f"[统计] {line}")
+
+    def send_msg(self, msg, who):
+        """发送微信消息并记录耗时"""
+        with metrics.timer('send_msg'):
+            self.wx.SendMsg(msg, who=who)
+
+    def _handle_message(self, msg, chat, log_callback, chat_name):
+        """接入引擎分发的消息，停止监听前已入队的消息也会在这里处理完"""
+        metrics.inc('messages_received_total')
+        with metrics.timer('on_message'):
+            self._dispatch_message(msg, chat, log_callback, chat_name)
 
+    def _dispatch_message(self, msg, chat, log_callback, chat_name):
+        """按消息类型提交到调度器：命令 > @消息 > 日志记录"""
         try:
             current_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
 
             # 使用wxauto消息对象的属性
             sender = getattr(msg, 'sender', getattr(msg, 'sendername', '未知发送人'))
             content = getattr(msg, 'content', str(msg))
-            chat_name = self.current_group or '未知群聊'
 
-            console_output = f"[{current_time}] [{chat_name}] [{sender}]: {content}"
-            log_entry = f"时间: {current_time}\n"
-            log_entry += f"群聊: {chat_name}\n"
-            log_entry += f"发送人: {sender}\n"
-            log_entry += f"内容: {content}\n"
-            log_entry += "-" * 50 + "\n\n"
+            if not self.scheduler.submit(PRIORITY_LOG, sender, self.record_message,
+                                         current_time, chat_name, sender, content, log_callback):
+                logging.warning(f"日志队列已满，未记录消息: {sender} -> {chat_name}")
 
-            with open(self.log_file_path, 'a', encoding='utf-8') as f:
-                f.write(log_entry)
-
-            logging.info(f"消息已记录: {sender} -> {chat_name}")
-
-            if log_callback:
-                log_callback(console_output)
-
-            # 处理特殊命令
-            if content.strip() == "/local chat":
-                self.reply_mode = "local"
-                reply_msg = "已切换到本地服务器回复模式"
-                self.wx.SendMsg(reply_msg, who=chat_name)
-                log_callback(f"[系统] {reply_msg}")
-                return
-            elif content.strip() == "/api chat":
-                self.reply_mode = "api"
-                reply_msg = "已切换到API回复模式"
-                self.wx.SendMsg(reply_msg, who=chat_name)
-                log_callback(f"[系统] {reply_msg}")
-                return
-            elif content.strip() == "/help":
-                help_msg = (
-                    "可用命令:\n"
-                    "/api chat - 切换到API回复模式\n"
-                    "/local chat - 切换到本地AI回复模式\n"
-                    "/help - 显示帮助信息"
-                )
-                self.wx.SendMsg(help_msg, who=chat_name)
-                log_callback(f"[系统] 已发送帮助信息")
+            command = content.strip()
+            if command in COMMANDS:
+                metrics.inc('commands_total', command=command)
+                if not self.scheduler.submit(PRIORITY_COMMAND, sender, self.handle_command,
+                                             command, chat_name, log_callback):
+                    self._report_rejected(sender, log_callback)
                 return
 
             if f"@{self.my_name}" in content:
+                metrics.inc('mentions_total')
                 logging.info(f"检测到@消息，来自: {sender}")
-                if log_callback:
-                    log_callback(f"[系统] 检测到@{self.my_name}，正在生成回复...")
 
-                threading.Thread(
-                    target=self.handle_mention_reply,
-                    args=(sender, content, log_callback, chat_name),
-                    daemon=True
-                ).start()
+                if self.scheduler.submit(PRIORITY_MENTION, sender, self.handle_mention_reply,
+                                         sender, content, log_callback, chat_name):
+                    if log_callback:
+                        log_callback(f"[系统] 检测到@{self.my_name}，正在生成回复...")
+                else:
+                    self._report_rejected(sender, log_callback)
 
         except Exception as e:
             error_details = f"处理消息时出错: {str(e)}. "
@@ -213,21 +260,72 @@ class WeChatMessageLogger:
             if log_callback:
                 log_callback(f"[错误] {error_details}")
 
+    def _report_rejected(self, sender, log_callback):
+        """记录被限流的请求"""
+        warning = f"[警告] {sender} 请求过于频繁，已忽略"
+        logging.warning(warning)
+        if log_callback:
+            log_callback(warning)
+
+    def record_message(self, current_time, chat_name, sender, content, log_callback):
+        """把消息写入日志文件"""
+        console_output = f"[{current_time}] [{chat_name}] [{sender}]: {content}"
+        log_entry = f"时间: {current_time}\n"
+        log_entry += f"群聊: {chat_name}\n"
+        log_entry += f"发送人: {sender}\n"
+        log_entry += f"内容: {content}\n"
+        log_entry += "-" * 50 + "\n\n"
+
+        # 调度器只有一个日志写入线程，无需额外加锁
+        with metrics.timer('log_write'), open(self.log_file_path, 'a', encoding='utf-8') as f:
+            f.write(log_entry)
+
+        logging.info(f"消息已记录: {sender} -> {chat_name}")
+
+        if log_callback:
+            log_callback(console_output)
+
+    def handle_command(self, command, chat_name, log_callback):
+        """处理群聊命令"""
+        if command == "/local chat":
+            self.reply_mode = "local"
+            reply_msg = "已切换到本地服务器回复模式"
+            self.send_msg(reply_msg, who=chat_name)
+            log_callback(f"[系统] {reply_msg}")
+        elif command == "/api chat":
+            self.reply_mode = "api"
+            reply_msg = "已切换到API回复模式"
+            self.send_msg(reply_msg, who=chat_name)
+            log_callback(f"[系统] {reply_msg}")
+        elif command == "/help":
+            help_msg = (
+                "可用命令:\n"
+                "/api chat - 切换到API回复模式\n"
+                "/local chat - 切换到本地AI回复模式\n"
+                "/help - 显示帮助信息"
+            )
+            self.send_msg(help_msg, who=chat_name)
+            log_callback(f"[系统] 已发送帮助信息")
+
     def handle_mention_reply(self, sender, content, log_callback, chat_name=None):
         """处理@消息并回复"""
+        with metrics.timer('mention_reply'):
+            self._reply_mention(sender, content, log_callback, chat_name)
+
+    def _reply_mention(self, sender, content, log_callback, chat_name=None):
         try:
             question = content.replace(f"@{self.my_name}", "").strip()
             chat_name = chat_name or self.current_group
 
             if self.reply_mode == "local":
-                reply = self.call_local_api(question)
+                reply = self.call_local_api(question, chat_name, sender)
             else:
-                reply = self.call_deepseek_api(question)
+                reply = self.call_deepseek_api(question, session_key=(chat_name, sender))
 
             formatted_reply = f"@{sender} {reply}"
 
             if chat_name:
-                self.wx.SendMsg(formatted_reply, who=chat_name)
+                self.send_msg(formatted_reply, who=chat_name)
                 log_msg = f"[系统] 已回复@{sender}: {reply[:50]}..."
             else:
                 log_msg = f"[错误] 无法发送回复，当前群聊未设置"
@@ -241,185 +339,107 @@ class WeChatMessageLogger:
             if log_callback:
                 log_callback(f"[错误] {error_msg}")
 
-    def keep_running(self):
-        """保持微信运行"""
-        while True:
-            try:
-                self.wx.KeepRunning()
-                time.sleep(1)
-            except Exception as e:
-                logging.error(f"保持微信运行时出错: {str(e)}")
-                time.sleep(5)
-
-
-class WeChatListenerUI:
-    def __init__(self, master):
-        self.master = master
-        master.title("微信AI助手")
-        master.geometry("800x600")
-
-        # 初始化日志器
-        self.logger = None
-
-        # 创建UI元素
-        self.create_widgets()
-
-    def create_widgets(self):
-        # 配置区域
-        config_frame = ttk.LabelFrame(self.master, text="配置", padding=10)
-        config_frame.pack(fill=tk.X, padx=10, pady=5)
-
-        # API密钥输入
-        ttk.Label(config_frame, text="DeepSeek API密钥:").grid(row=0, column=0, sticky=tk.W)
-        self.api_key_entry = ttk.Entry(config_frame, width=50)
-        self.api_key_entry.grid(row=0, column=1, padx=5, pady=5)
-
-        # 我的微信昵称
-        ttk.Label(config_frame, text="我的微信昵称:").grid(row=1, column=0, sticky=tk.W)
-        self.my_name_entry = ttk.Entry(config_frame, width=30)
-        self.my_name_entry.grid(row=1, column=1, padx=5, pady=5, sticky=tk.W)
-
-        # 日志文件路径
-        ttk.Label(config_frame, text="日志文件路径:").grid(row=2, column=0, sticky=tk.W)
-        self.log_path_entry = ttk.Entry(config_frame, width=50)
-        self.log_path_entry.grid(row=2, column=1, padx=5, pady=5)
-        self.log_path_entry.insert(0, "wechat_messages.log")
-
-        # 监听群聊名称
-        ttk.Label(config_frame, text="监听群聊名称:").grid(row=3, column=0, sticky=tk.W)
-        self.group_name_entry = ttk.Entry(config_frame, width=30)
-        self.group_name_entry.grid(row=3, column=1, padx=5, pady=5, sticky=tk.W)
-
-        # 按钮区域
-        button_frame = ttk.Frame(self.master)
-        button_frame.pack(fill=tk.X, padx=10, pady=5)
-
-        self.start_btn = AnimatedButton(
-            button_frame,
-            text="开始监听",
-            command=self.start_listening,
-            bg="#4CAF50",
-            fg="white",
-            activebackground="#45a049"
-        )
-        self.start_btn.pack(side=tk.LEFT, padx=5)
-
-        self.stop_btn = AnimatedButton(
-            button_frame,
-            text="停止监听",
-            command=self.stop_listening,
-            bg="#f44336",
-            fg="white",
-            activebackground="#d32f2f"
-        )
-        self.stop_btn.pack(side=tk.LEFT, padx=5)
-
-        self.help_btn = AnimatedButton(
-            button_frame,
-            text="帮助",
-            command=self.show_help,
-            bg="#2196F3",
-            fg="white",
-            activebackground="#0b7dda"
-        )
-        self.help_btn.pack(side=tk.LEFT, padx=5)
-
-        # 日志显示区域
-        log_frame = ttk.LabelFrame(self.master, text="日志", padding=10)
-        log_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
 
-        self.log_text = scrolledtext.ScrolledText(log_frame, height=15)
-        self.log_text.pack(fill=tk.BOTH, expand=True)
+def load_config(args):
+    """合并配置文件和命令行参数，命令行优先"""
+    config = {
+        "api_key": os.environ.get("DEEPSEEK_API_KEY", ""),
+        "my_name": "",
+        "log_path": "wechat_messages.log",
+        "group_name": "",
+        "reply_mode": "api",
+        "stats_interval": 300,
+        "workers": 8,
+        "rate_limit": 6,
+        "command_rate_limit": 10,
+        "intake_mode": "callback",
+        "shutdown_timeout": 30,
+    }
+    if args.config:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+    for key in config:
+        value = getattr(args, key, None)
+        if value is not None:
+            config[key] = value
+    return config
+
+
+def run_headless(config):
+    """无界面运行监听端，收到 SIGINT/SIGTERM 后退出"""
+    def console_log(message):
+        print(message, flush=True)
+
+    missing = [key for key in ("api_key", "my_name", "log_path", "group_name") if not config.get(key)]
+    if missing:
+        console_log(f"[错误] 缺少配置: {', '.join(missing)}")
+        return 1
+
+    logger = WeChatMessageLogger(
+        config["log_path"], config["api_key"], config["my_name"],
+        stats_interval=config["stats_interval"],
+        workers=config["workers"],
+        rate_limit=config["rate_limit"],
+        command_rate_limit=config["command_rate_limit"],
+        intake_mode=config["intake_mode"]
+    )
+    logger.reply_mode = config["reply_mode"]
+    logger.start_listening(config["group_name"], console_log)
+
+    startup = time.perf_counter() - _PROCESS_START
+    logging.info(f"监听端启动完成，耗时 {startup * 1000:.0f}ms")
+    console_log(f"[系统] 启动完成，耗时 {startup * 1000:.0f}ms")
+
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: stop_event.set())
+    while not stop_event.wait(1):
+        pass
+
+    # 后台线程都是守护线程，退出前等已收到的消息处理完，避免丢失
+    logger.stop_listening()
+    console_log("[系统] 正在处理剩余消息...")
+    if not logger.wait_idle(config["shutdown_timeout"]):
+        dropped = logger.pending_tasks()
+        logging.warning(f"等待剩余消息超时，丢弃 {dropped} 个未完成的任务")
+        console_log(f"[警告] 等待剩余消息超时，丢弃 {dropped} 个未完成的任务")
+    logger.dump_stats(console_log)
+    console_log("[系统] 已停止监听")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="微信AI助手监听端")
+    parser.add_argument("--headless", action="store_true", help="不启动图形界面，直接开始监听")
+    parser.add_argument("--config", help="JSON配置文件路径")
+    parser.add_argument("--api-key", dest="api_key", help="DeepSeek API密钥，也可用环境变量 DEEPSEEK_API_KEY")
+    parser.add_argument("--my-name", dest="my_name", help="我的微信昵称")
+    parser.add_argument("--log-path", dest="log_path", help="消息日志文件路径")
+    parser.add_argument("--group", dest="group_name", help="监听群聊名称")
+    parser.add_argument("--reply-mode", dest="reply_mode", choices=["api", "local"], help="回复模式")
+    parser.add_argument("--stats-interval", dest="stats_interval", type=int, help="统计输出间隔（秒），0表示关闭")
+    parser.add_argument("--workers", type=int, help="命令和@回复的处理线程数，至少为2")
+    parser.add_argument("--rate-limit", dest="rate_limit", type=int, help="每个发送人每分钟最多触发的回复数，0表示不限")
+    parser.add_argument("--intake-mode", dest="intake_mode", choices=["callback", "poll"],
+                        help="消息接入方式：callback（wxauto 4回调）或 poll（wxauto 3.9轮询，自适应间隔）")
+    parser.add_argument("--command-rate-limit", dest="command_rate_limit", type=int,
+                        help="每个发送人每分钟最多执行的命令数，0表示不限")
+    parser.add_argument("--shutdown-timeout", dest="shutdown_timeout", type=float,
+                        help="停止时等待剩余消息处理完的最长时间（秒）")
+    args = parser.parse_args(argv)
+
+    if args.headless:
+        return run_headless(load_config(args))
+
+    # 图形界面按需导入，无界面模式不加载 tkinter；图形界面只能从这里启动
+    import tkinter as tk
+    from 监听界面 import WeChatListenerUI
 
-    def start_listening(self):
-        """开始监听按钮事件"""
-        api_key = self.api_key_entry.get().strip()
-        my_name = self.my_name_entry.get().strip()
-        log_path = self.log_path_entry.get().strip()
-        group_name = self.group_name_entry.get().strip()
-
-        if not all([api_key, my_name, log_path, group_name]):
-            messagebox.showerror("错误", "请填写所有必填字段!")
-            return
-
-        if not self.logger:
-            self.logger = WeChatMessageLogger(log_path, api_key, my_name)
-            # 启动保持微信运行的线程
-            threading.Thread(
-                target=self.logger.keep_running,
-                daemon=True
-            ).start()
-
-        self.logger.start_listening(group_name, self.log_callback)
-        self.log_callback(f"[系统] 正在启动监听: {group_name}")
-        self.log_callback(f"[系统] 在群聊中输入 '/help' 查看可用命令")
-
-    def stop_listening(self):
-        """停止监听按钮事件"""
-        if hasattr(self, 'logger') and self.logger:
-            self.logger.stop_listening()
-            self.log_callback("[系统] 已停止监听")
-
-    def show_help(self):
-        """显示帮助信息"""
-        help_window = tk.Toplevel(self.master)
-        help_window.title("使用帮助")
-        help_window.geometry("600x400")
-
-        help_text = """
-        ========== 微信AI助手 使用说明 ==========
-
-        1. 配置信息:
-          - DeepSeek API密钥: 从DeepSeek官网获取的API密钥
-          - 我的微信昵称: 在微信中使用的昵称
-          - 日志文件路径: 消息日志保存的文件路径
-          - 监听群聊名称: 要监听的微信群聊名称
-
-        2. 操作步骤:
-          a) 填写所有必填字段
-          b) 点击"开始监听"按钮
-          c) 程序将在后台监听指定群聊的消息
-
-        3. 群聊命令:
-          /api chat - 切换到DeepSeek API回复模式
-          /local chat - 切换到本地AI回复模式
-          /help - 显示帮助信息
-
-        4. 使用AI功能:
-          在群聊中 @你的昵称 + 问题，AI会自动回复
-
-        5. 停止监听:
-          点击"停止监听"按钮可以停止消息监听
-
-        6. 注意事项:
-          - 确保微信桌面版已登录并保持运行
-          - 本地AI服务需在 http://localhost:5000 运行
-          - 使用API模式需要有效的DeepSeek API密钥
-
-        7. 日志功能:
-          所有消息和系统事件都会记录在日志区域和日志文件中
-        """
-
-        help_text_area = scrolledtext.ScrolledText(help_window, wrap=tk.WORD)
-        help_text_area.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        help_text_area.insert(tk.INSERT, help_text)
-        help_text_area.configure(state='disabled')
-
-        close_btn = ttk.Button(
-            help_window,
-            text="关闭",
-            command=help_window.destroy
-        )
-        close_btn.pack(pady=10)
-
-    def log_callback(self, message):
-        """日志回调函数"""
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END)
-        self.log_text.update()
+    root = tk.Tk()
+    app = WeChatListenerUI(root, WeChatMessageLogger)
+    root.mainloop()
+    return 0
 
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = WeChatListenerUI(root)
-    root.mainloop()
\ No newline at end of file
+    sys.exit(main())